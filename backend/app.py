@@ -4,11 +4,14 @@ import jwt
 import os
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-from models import init_db, UserModel, SkillModel, SwapModel, RatingModel, get_db  # Added get_db import
+from models import init_db, UserModel, SkillModel, SwapModel, RatingModel, get_db, fetch_all, fetch_one
+from json_provider import init_json
+from jobs import enqueue, get_metrics, JobRunner
 import uuid
 
 app = Flask(__name__)
 CORS(app)
+init_json(app)  # Uses orjson for responses when it is installed
 
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
 app.config['UPLOAD_FOLDER'] = 'uploads'
@@ -300,15 +303,27 @@ def add_rating():
     if not all(field in data for field in required_fields):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    rating_id = RatingModel.add_rating(
-        data['swap_request_id'],
-        request.user_id,
-        data['rated_id'],
-        data['rating'],
-        data.get('feedback', '')
-    )
+    ids = (data['swap_request_id'], data['rated_id'])
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in ids):
+        return jsonify({'error': 'Invalid swap or user id'}), 400
+    
+    rating = data['rating']
+    if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+        return jsonify({'error': 'Rating must be between 1 and 5'}), 400
+    
+    if not isinstance(data.get('feedback', ''), str):
+        return jsonify({'error': 'Invalid feedback'}), 400
     
-    return jsonify({'id': rating_id, 'message': 'Rating added successfully'})
+    # One rating per rater per swap, so repeated submits collapse into one job
+    job_id = enqueue('add_rating', {
+        'swap_request_id': data['swap_request_id'],
+        'rater_id': request.user_id,
+        'rated_id': data['rated_id'],
+        'rating': data['rating'],
+        'feedback': data.get('feedback', '')
+    }, idempotency_key=f"rating:{data['swap_request_id']}:{request.user_id}")
+    
+    return jsonify({'job_id': job_id, 'message': 'Rating submitted successfully'}), 202
 
 # Admin Routes
 @app.route('/api/admin/users', methods=['GET'])
@@ -320,17 +335,17 @@ def admin_get_users():
     
     with get_db() as conn:
         offset = (page - 1) * per_page
-        users = conn.execute('''
+        users = fetch_all(conn, '''
             SELECT id, username, name, email, location, is_banned, created_at
             FROM users
             ORDER BY created_at DESC
             LIMIT ? OFFSET ?
-        ''', (per_page, offset)).fetchall()
+        ''', (per_page, offset))
         
-        total = conn.execute('SELECT COUNT(*) as count FROM users').fetchone()
+        total = fetch_one(conn, 'SELECT COUNT(*) as count FROM users')
     
     return jsonify({
-        'users': [dict(user) for user in users],
+        'users': users,
         'total': total['count'],
         'page': page,
         'per_page': per_page
@@ -368,13 +383,19 @@ def admin_send_message():
 @require_admin
 def admin_get_messages():
     with get_db() as conn:
-        messages = conn.execute('''
-            SELECT * FROM admin_messages 
+        messages = fetch_all(conn, '''
+            SELECT id, title, message, created_at FROM admin_messages 
             ORDER BY created_at DESC 
             LIMIT 50
-        ''').fetchall()
+        ''')
     
-    return jsonify({'messages': [dict(msg) for msg in messages]})
+    return jsonify({'messages': messages})
+
+@app.route('/api/admin/jobs/metrics', methods=['GET'])
+@require_auth
+@require_admin
+def admin_job_metrics():
+    return jsonify(get_metrics())
 
 # Create admin user function
 def create_admin():
@@ -396,4 +417,8 @@ def create_admin():
 if __name__ == '__main__':
     init_db()
     create_admin()  # Creates admin user if it doesn't exist
+    # In-process workers; run `python jobs.py worker` for dedicated ones.
+    # Skip the reloader's parent process so jobs are not run twice.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        JobRunner().start()
     app.run(debug=True)
\ No newline at end of file
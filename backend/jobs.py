@@ -0,0 +1,175 @@
+import argparse
+import sqlite3
+import threading
+import time
+import traceback
+from models import init_db, get_db, JobModel, RatingModel
+
+HANDLERS = {}
+
+# Errors that will fail the same way on every attempt
+NO_RETRY_ERRORS = (sqlite3.IntegrityError,)
+
+def job(name):
+    def register(f):
+        HANDLERS[name] = f
+        return f
+    return register
+
+def enqueue(name, payload, idempotency_key=None, max_attempts=5):
+    if name not in HANDLERS:
+        raise ValueError(f"Unknown job: {name}")
+    return JobModel.enqueue(name, payload, idempotency_key, max_attempts)
+
+def retry_delay(attempts, base=2, cap=300):
+    # Exponential backoff: 2s, 4s, 8s, ... capped at 5 minutes
+    return min(cap, base * (2 ** (attempts - 1)))
+
+# Job handlers
+# Handlers may run more than once (retries, expired leases), so keep them idempotent.
+@job('add_rating')
+def add_rating_job(payload):
+    with get_db() as conn:
+        existing = conn.execute(
+            'SELECT id FROM ratings WHERE swap_request_id = ? AND rater_id = ?',
+            (payload['swap_request_id'], payload['rater_id'])
+        ).fetchone()
+    if existing:
+        return
+
+    RatingModel.add_rating(
+        payload['swap_request_id'],
+        payload['rater_id'],
+        payload['rated_id'],
+        payload['rating'],
+        payload['feedback']
+    )
+
+def run_job(job):
+    handler = HANDLERS.get(job['name'])
+    if not handler:
+        JobModel.mark_failed(job['id'], f"No handler registered for job: {job['name']}")
+        return False
+
+    try:
+        handler(job['payload'])
+    except NO_RETRY_ERRORS:
+        JobModel.mark_failed(job['id'], traceback.format_exc())
+        return False
+    except Exception:
+        error = traceback.format_exc()
+        if job['attempts'] >= job['max_attempts']:
+            JobModel.mark_failed(job['id'], error)
+        else:
+            JobModel.mark_failed(job['id'], error, retry_delay(job['attempts']))
+        return False
+
+    JobModel.mark_done(job['id'])
+    return True
+
+class JobRunner:
+    def __init__(self, threads=2, poll_interval=0.5, lease_seconds=300,
+                 retention_seconds=7 * 24 * 3600, prune_interval=3600):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self.prune_interval = prune_interval
+        self._stop = threading.Event()
+        self._workers = []
+        self._prune_lock = threading.Lock()
+        self._last_prune = 0
+
+    def prune(self):
+        # Only one worker thread prunes per interval
+        with self._prune_lock:
+            if time.time() - self._last_prune < self.prune_interval:
+                return 0
+            self._last_prune = time.time()
+        try:
+            return JobModel.prune(self.retention_seconds)
+        except Exception as e:
+            print(f"Error pruning jobs: {e}")
+            return 0
+
+    def run_once(self):
+        try:
+            job = JobModel.claim_next(self.lease_seconds)
+        except Exception as e:
+            # Usually "database is locked" while another worker claims
+            print(f"Error claiming job: {e}")
+            return False
+        if not job:
+            return False
+        run_job(job)
+        return True
+
+    def _work(self):
+        while not self._stop.is_set():
+            if not self.run_once():
+                self.prune()
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        for i in range(self.threads):
+            worker = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def drain(self):
+        # Process everything that is currently due, then return
+        processed = 0
+        while self.run_once():
+            processed += 1
+        return processed
+
+def get_metrics():
+    return JobModel.get_stats()
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background job workers')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    worker_parser = subparsers.add_parser('worker', help='Run job workers until interrupted')
+    worker_parser.add_argument('--threads', type=int, default=2)
+    worker_parser.add_argument('--poll-interval', type=float, default=0.5)
+    worker_parser.add_argument('--lease-seconds', type=int, default=300)
+
+    subparsers.add_parser('drain', help='Run all due jobs and exit')
+    subparsers.add_parser('stats', help='Print queue depth and job latency')
+
+    prune_parser = subparsers.add_parser('prune', help='Delete finished jobs older than the retention period')
+    prune_parser.add_argument('--days', type=float, default=7)
+
+    args = parser.parse_args()
+    init_db()
+
+    if args.command == 'worker':
+        runner = JobRunner(args.threads, args.poll_interval, args.lease_seconds)
+        runner.start()
+        print(f"Started {args.threads} job worker(s)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("Stopping job workers")
+            runner.stop()
+    elif args.command == 'drain':
+        processed = JobRunner().drain()
+        print(f"Processed {processed} job(s)")
+    elif args.command == 'stats':
+        stats = get_metrics()
+        print(f"Queue depth: {stats['queue_depth']}")
+        print(f"Latency: {stats['latency']}")
+    elif args.command == 'prune':
+        deleted = JobModel.prune(args.days * 24 * 3600)
+        print(f"Deleted {deleted} job(s)")
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
 import sqlite3
 import hashlib
 import uuid
+import json
+import time
 from datetime import datetime
 import os
 
@@ -11,6 +13,40 @@ def get_db():
     conn.row_factory = sqlite3.Row
     return conn
 
+# Column names per query, so rows can be fetched as plain tuples
+_columns_cache = {}
+
+def _columns(cursor, sql):
+    columns = _columns_cache.get(sql)
+    if columns is None:
+        columns = _columns_cache[sql] = tuple(col[0] for col in cursor.description)
+    return columns
+
+def fetch_all(conn, sql, params=()):
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(sql, params)
+    columns = _columns(cursor, sql)
+    return [dict(zip(columns, row)) for row in cursor]
+
+def fetch_one(conn, sql, params=()):
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(sql, params)
+    row = cursor.fetchone()
+    return dict(zip(_columns(cursor, sql), row)) if row else None
+
+# Explicit projections; never return password_hash or reset_token to clients
+USER_COLUMNS = '''
+    id, username, email, name, location, profile_photo, bio, availability,
+    is_public, is_admin, created_at
+'''
+SKILL_COLUMNS = 'id, skill_name, description'
+SWAP_COLUMNS = '''
+    sr.id, sr.requester_id, sr.provider_id, sr.skill_offered, sr.skill_wanted,
+    sr.message, sr.status, sr.created_at, sr.updated_at
+'''
+
 def init_db():
     with get_db() as conn:
         conn.executescript('''
@@ -80,6 +116,24 @@ def init_db():
                 message TEXT NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
+
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                idempotency_key TEXT UNIQUE,
+                status TEXT DEFAULT 'queued',
+                attempts INTEGER DEFAULT 0,
+                max_attempts INTEGER DEFAULT 5,
+                last_error TEXT,
+                enqueued_at REAL NOT NULL,
+                run_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs (status, run_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_status_finished_at ON jobs (status, finished_at);
         ''')
 
 def hash_password(password):
@@ -106,17 +160,16 @@ class UserModel:
     def authenticate(username, password):
         password_hash = hash_password(password)
         with get_db() as conn:
-            user = conn.execute(
-                'SELECT * FROM users WHERE username = ? AND password_hash = ? AND is_banned = 0',
+            return fetch_one(
+                conn,
+                f'SELECT {USER_COLUMNS} FROM users WHERE username = ? AND password_hash = ? AND is_banned = 0',
                 (username, password_hash)
-            ).fetchone()
-            return dict(user) if user else None
+            )
 
     @staticmethod
     def get_user(user_id):
         with get_db() as conn:
-            user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-            return dict(user) if user else None
+            return fetch_one(conn, f'SELECT {USER_COLUMNS} FROM users WHERE id = ?', (user_id,))
 
     @staticmethod
     def update_user(user_id, **kwargs):
@@ -141,7 +194,7 @@ class UserModel:
     def search_users(query, page=1, per_page=10):
         offset = (page - 1) * per_page
         with get_db() as conn:
-            users = conn.execute('''
+            return fetch_all(conn, '''
                 SELECT DISTINCT u.id, u.username, u.name, u.location, u.profile_photo, u.bio
                 FROM users u
                 LEFT JOIN skills_offered so ON u.id = so.user_id
@@ -151,8 +204,7 @@ class UserModel:
                     so.skill_name LIKE ? OR sw.skill_name LIKE ?
                 )
                 LIMIT ? OFFSET ?
-            ''', (f'%{query}%', f'%{query}%', f'%{query}%', f'%{query}%', per_page, offset)).fetchall()
-            return [dict(user) for user in users]
+            ''', (f'%{query}%', f'%{query}%', f'%{query}%', f'%{query}%', per_page, offset))
 
 class SkillModel:
     @staticmethod
@@ -176,15 +228,13 @@ class SkillModel:
     @staticmethod
     def get_user_skills(user_id):
         with get_db() as conn:
-            offered = conn.execute(
-                'SELECT * FROM skills_offered WHERE user_id = ?', (user_id,)
-            ).fetchall()
-            wanted = conn.execute(
-                'SELECT * FROM skills_wanted WHERE user_id = ?', (user_id,)
-            ).fetchall()
             return {
-                'offered': [dict(skill) for skill in offered],
-                'wanted': [dict(skill) for skill in wanted]
+                'offered': fetch_all(
+                    conn, f'SELECT {SKILL_COLUMNS} FROM skills_offered WHERE user_id = ?', (user_id,)
+                ),
+                'wanted': fetch_all(
+                    conn, f'SELECT {SKILL_COLUMNS} FROM skills_wanted WHERE user_id = ?', (user_id,)
+                )
             }
 
     @staticmethod
@@ -210,26 +260,23 @@ class SwapModel:
     @staticmethod
     def get_user_swaps(user_id):
         with get_db() as conn:
-            sent = conn.execute('''
-                SELECT sr.*, u.name as provider_name, u.username as provider_username
+            sent = fetch_all(conn, f'''
+                SELECT {SWAP_COLUMNS}, u.name as provider_name, u.username as provider_username
                 FROM swap_requests sr
                 JOIN users u ON sr.provider_id = u.id
                 WHERE sr.requester_id = ?
                 ORDER BY sr.created_at DESC
-            ''', (user_id,)).fetchall()
+            ''', (user_id,))
             
-            received = conn.execute('''
-                SELECT sr.*, u.name as requester_name, u.username as requester_username
+            received = fetch_all(conn, f'''
+                SELECT {SWAP_COLUMNS}, u.name as requester_name, u.username as requester_username
                 FROM swap_requests sr
                 JOIN users u ON sr.requester_id = u.id
                 WHERE sr.provider_id = ?
                 ORDER BY sr.created_at DESC
-            ''', (user_id,)).fetchall()
+            ''', (user_id,))
             
-            return {
-                'sent': [dict(swap) for swap in sent],
-                'received': [dict(swap) for swap in received]
-            }
+            return {'sent': sent, 'received': received}
 
     @staticmethod
     def update_swap_status(swap_id, status, user_id):
@@ -261,20 +308,147 @@ class RatingModel:
     @staticmethod
     def get_user_ratings(user_id):
         with get_db() as conn:
-            ratings = conn.execute('''
-                SELECT r.*, u.name as rater_name
+            return fetch_all(conn, '''
+                SELECT r.id, r.rating, r.feedback, r.created_at, u.name as rater_name
                 FROM ratings r
                 JOIN users u ON r.rater_id = u.id
                 WHERE r.rated_id = ?
                 ORDER BY r.created_at DESC
-            ''', (user_id,)).fetchall()
-            return [dict(rating) for rating in ratings]
+            ''', (user_id,))
 
     @staticmethod
     def get_average_rating(user_id):
         with get_db() as conn:
-            result = conn.execute(
+            result = fetch_one(
+                conn,
                 'SELECT AVG(rating) as avg_rating, COUNT(*) as count FROM ratings WHERE rated_id = ?',
                 (user_id,)
+            )
+            return result if result else {'avg_rating': 0, 'count': 0}
+
+class JobModel:
+    @staticmethod
+    def enqueue(name, payload, idempotency_key=None, max_attempts=5, delay=0):
+        now = time.time()
+        with get_db() as conn:
+            # A failed job with the same key is requeued with the new payload;
+            # a queued, running or done one is left alone
+            cursor = conn.execute('''
+                INSERT INTO jobs (name, payload, idempotency_key, max_attempts, enqueued_at, run_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (idempotency_key) DO UPDATE SET
+                    name = excluded.name,
+                    payload = excluded.payload,
+                    status = 'queued',
+                    attempts = 0,
+                    max_attempts = excluded.max_attempts,
+                    last_error = NULL,
+                    enqueued_at = excluded.enqueued_at,
+                    run_at = excluded.run_at,
+                    started_at = NULL,
+                    finished_at = NULL
+                WHERE jobs.status = 'failed'
+            ''', (name, json.dumps(payload), idempotency_key, max_attempts, now, now + delay))
+            if idempotency_key is None:
+                return cursor.lastrowid
+            job = conn.execute(
+                'SELECT id FROM jobs WHERE idempotency_key = ?', (idempotency_key,)
             ).fetchone()
-            return dict(result) if result else {'avg_rating': 0, 'count': 0}
\ No newline at end of file
+            return job['id']
+
+    @staticmethod
+    def claim_next(lease_seconds=300):
+        now = time.time()
+        with get_db() as conn:
+            # Running jobs past their lease belong to a worker that died;
+            # give up on those that have used all their attempts
+            conn.execute('''
+                UPDATE jobs
+                SET status = 'failed', last_error = 'Lease expired on final attempt', finished_at = ?
+                WHERE status = 'running' AND started_at <= ? AND attempts >= max_attempts
+            ''', (now, now - lease_seconds))
+
+            candidates = conn.execute('''
+                SELECT id FROM jobs
+                WHERE (status = 'queued' AND run_at <= ?)
+                   OR (status = 'running' AND started_at <= ? AND attempts < max_attempts)
+                ORDER BY run_at, id
+                LIMIT 5
+            ''', (now, now - lease_seconds)).fetchall()
+
+            for candidate in candidates:
+                # Conditional update so only one worker wins the claim
+                cursor = conn.execute('''
+                    UPDATE jobs
+                    SET status = 'running', attempts = attempts + 1, started_at = ?
+                    WHERE id = ? AND (
+                        (status = 'queued' AND run_at <= ?)
+                        OR (status = 'running' AND started_at <= ? AND attempts < max_attempts)
+                    )
+                ''', (now, candidate['id'], now, now - lease_seconds))
+                if cursor.rowcount:
+                    job = fetch_one(conn, 'SELECT * FROM jobs WHERE id = ?', (candidate['id'],))
+                    job['payload'] = json.loads(job['payload'])
+                    return job
+            return None
+
+    @staticmethod
+    def mark_done(job_id):
+        with get_db() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = 'done', last_error = NULL, finished_at = ?
+                WHERE id = ?
+            ''', (time.time(), job_id))
+
+    @staticmethod
+    def mark_failed(job_id, error, retry_delay=None):
+        with get_db() as conn:
+            if retry_delay is None:
+                conn.execute('''
+                    UPDATE jobs SET status = 'failed', last_error = ?, finished_at = ?
+                    WHERE id = ?
+                ''', (error, time.time(), job_id))
+            else:
+                conn.execute('''
+                    UPDATE jobs SET status = 'queued', last_error = ?, run_at = ?
+                    WHERE id = ?
+                ''', (error, time.time() + retry_delay, job_id))
+
+    @staticmethod
+    def get_job(job_id):
+        with get_db() as conn:
+            return fetch_one(conn, 'SELECT * FROM jobs WHERE id = ?', (job_id,))
+
+    @staticmethod
+    def prune(older_than_seconds):
+        cutoff = time.time() - older_than_seconds
+        with get_db() as conn:
+            cursor = conn.execute('''
+                DELETE FROM jobs
+                WHERE status IN ('done', 'failed') AND finished_at < ?
+            ''', (cutoff,))
+            return cursor.rowcount
+
+    @staticmethod
+    def get_stats(window=100):
+        with get_db() as conn:
+            depth = conn.execute(
+                'SELECT status, COUNT(*) as count FROM jobs GROUP BY status'
+            ).fetchall()
+            latency = fetch_one(conn, '''
+                SELECT AVG(started_at - enqueued_at) as avg_wait_seconds,
+                       MAX(started_at - enqueued_at) as max_wait_seconds,
+                       AVG(finished_at - started_at) as avg_run_seconds,
+                       MAX(finished_at - started_at) as max_run_seconds,
+                       COUNT(*) as sample_size
+                FROM (
+                    SELECT enqueued_at, started_at, finished_at FROM jobs
+                    WHERE status = 'done'
+                    ORDER BY finished_at DESC
+                    LIMIT ?
+                )
+            ''', (window,))
+            return {
+                'queue_depth': {row['status']: row['count'] for row in depth},
+                'latency': latency
+            }